@@ -0,0 +1,157 @@
+# anomaly_score.py
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Optional
+
+
+# 지표행렬 구성 컬럼 (apply_baseline_rules 결과 + 파생 비율)
+FEATURE_COLS = [
+    "ind_over_tank", "ind_over_tank_cnt", "ind_max_daily_refuel",
+    "ind_fuel_ratio", "ind_station_max_share",
+    "night_refuel_share", "idle_drive_ratio",
+]
+
+
+@dataclass
+class AnomalyParams:
+    # 동일 집단(peer group) 기준 컬럼. 없으면 전체를 하나의 집단으로 봄
+    group_col: str = "ton_class"
+
+    # 이보다 작은 집단은 전체 중앙값/MAD 사용
+    min_group_size: int = 30
+
+    # 배치 크기 (행)
+    chunk_rows: int = 200_000
+
+    # robust z 절단값 (극단값 하나가 공분산을 지배하지 않도록)
+    z_clip: float = 10.0
+
+    # 공분산 축소(ridge) 계수
+    shrinkage: float = 0.05
+
+
+def build_feature_matrix(summary: pd.DataFrame) -> np.ndarray:
+    """
+    summary의 ind_* 지표 + 야간주유 비율 + DTG 공회전/주행 비율로 float32 행렬 생성
+    """
+    def num(col):
+        if col not in summary.columns:
+            return pd.Series(0.0, index=summary.index)
+        return pd.to_numeric(summary[col], errors="coerce").astype(float)
+
+    refuel = num("refuel_cnt").replace(0, np.nan)
+    drive_hr = num("total_drive_time_hr").replace(0, np.nan)
+
+    feats = pd.DataFrame({
+        "ind_over_tank": num("ind_over_tank"),
+        "ind_over_tank_cnt": num("ind_over_tank_cnt"),
+        "ind_max_daily_refuel": num("ind_max_daily_refuel"),
+        "ind_fuel_ratio": num("ind_fuel_ratio"),
+        "ind_station_max_share": num("ind_station_max_share"),
+        "night_refuel_share": num("night_refuel_cnt") / refuel,
+        "idle_drive_ratio": (num("total_idle_time_min") / 60.0) / drive_hr,
+    }, index=summary.index)
+
+    feats = feats.replace([np.inf, -np.inf], np.nan).fillna(0)
+    return feats[FEATURE_COLS].to_numpy(dtype=np.float32)
+
+
+def _robust_center_scale(x: np.ndarray):
+    """
+    열별 중앙값 / 척도. 척도는 1.4826*MAD, MAD=0이면 1.2533*평균절대편차, 그래도 0이면 1
+    """
+    med = np.median(x, axis=0)
+    dev = np.abs(x - med)
+    scale = 1.4826 * np.median(dev, axis=0)
+    mean_ad = 1.2533 * dev.mean(axis=0)
+    scale = np.where(scale > 0, scale, mean_ad)
+    scale = np.where(scale > 0, scale, 1.0)
+    return med.astype(np.float32), scale.astype(np.float32)
+
+
+def _peer_group_stats(x: np.ndarray, groups: np.ndarray, params: AnomalyParams):
+    """
+    집단별 중앙값/척도 (마지막 행 = 전체) 와 행별 집단 인덱스 반환
+    """
+    codes, uniq = pd.factorize(groups)
+    n_groups = len(uniq)
+
+    g_med, g_scale = _robust_center_scale(x)
+    med = np.tile(g_med, (n_groups + 1, 1))
+    scale = np.tile(g_scale, (n_groups + 1, 1))
+
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(n_groups + 1))
+    for g in range(n_groups):
+        idx = order[bounds[g]:bounds[g + 1]]
+        if len(idx) >= params.min_group_size:
+            med[g], scale[g] = _robust_center_scale(x[idx])
+
+    # factorize 결측(-1)은 마지막 행(전체 통계)으로
+    row_stat = np.where(codes < 0, n_groups, codes)
+    return med, scale, row_stat
+
+
+def compute_anomaly_scores(x: np.ndarray,
+                           groups: Optional[np.ndarray] = None,
+                           params: Optional[AnomalyParams] = None) -> np.ndarray:
+    """
+    집단 정규화 robust z -> 공분산(배치 누적) -> Mahalanobis 거리 (배치 계산)
+    """
+    if params is None:
+        params = AnomalyParams()
+
+    n, p = x.shape
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    if groups is None:
+        groups = np.zeros(n, dtype=np.int8)
+
+    med, scale, row_stat = _peer_group_stats(x, groups, params)
+    step = params.chunk_rows
+
+    def z_batch(s):
+        rs = row_stat[s:s + step]
+        z = (x[s:s + step] - med[rs]) / scale[rs]
+        return np.clip(z, -params.z_clip, params.z_clip)
+
+    # 1) 공분산 누적 (float64)
+    zsum = np.zeros(p)
+    zz = np.zeros((p, p))
+    for s in range(0, n, step):
+        z = z_batch(s).astype(np.float64)
+        zsum += z.sum(axis=0)
+        zz += z.T @ z
+
+    mean = zsum / n
+    cov = zz / n - np.outer(mean, mean)
+    cov = (1 - params.shrinkage) * cov + params.shrinkage * np.eye(p) * max(np.trace(cov) / p, 1e-6)
+    prec = np.linalg.pinv(cov).astype(np.float32)
+
+    # 2) 거리 계산 (집단 중앙값 기준이므로 mean으로 재중심화하지 않음)
+    out = np.empty(n, dtype=np.float32)
+    for s in range(0, n, step):
+        z = z_batch(s)
+        d2 = ((z @ prec) * z).sum(axis=1)
+        out[s:s + step] = np.sqrt(np.maximum(d2, 0))
+    return out
+
+
+def apply_anomaly_scores(summary: pd.DataFrame,
+                         params: Optional[AnomalyParams] = None) -> pd.DataFrame:
+    """
+    apply_baseline_rules 결과에 anomaly_score(robust Mahalanobis 거리) 컬럼 추가
+    """
+    if params is None:
+        params = AnomalyParams()
+
+    summary = summary.copy()
+    x = build_feature_matrix(summary)
+
+    groups = None
+    if params.group_col in summary.columns:
+        groups = summary[params.group_col].to_numpy()
+
+    summary["anomaly_score"] = np.round(compute_anomaly_scores(x, groups, params), 2)
+    return summary
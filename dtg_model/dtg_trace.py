@@ -0,0 +1,296 @@
+# dtg_trace.py
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+
+# raw DTG trace 컬럼 (1Hz, vehicle_id -> timestamp 순 정렬 가정). rpm은 선택 컬럼
+TRACE_COLUMNS = ["vehicle_id", "timestamp", "speed_kmh", "lat", "lon", "rpm"]
+
+# dtg_daily_expanded.csv 와 동일한 일별 스키마
+DAILY_COLUMNS = ["vehicle_id", "total_distance_km", "drive_time_hr",
+                 "avg_speed_kmh", "idle_time_min", "date"]
+
+TRIP_COLUMNS = ["vehicle_id", "trip_no", "start_dt", "end_dt", "duration_min",
+                "distance_km", "start_lat", "start_lon", "end_lat", "end_lon"]
+
+REFUEL_POS_COLUMNS = ["transaction_id", "refuel_lat", "refuel_lon",
+                      "refuel_speed_kmh", "refuel_gap_s"]
+
+
+@dataclass
+class TraceParams:
+    # 한 번에 읽는 레코드 수 (고정 버퍼 크기 -> 메모리 상한)
+    chunk_rows: int = 500_000
+
+    # 이 속도(km/h) 이상이면 주행, 미만이면 정차
+    moving_speed_kmh: float = 3.0
+
+    # 정차 중 rpm이 이 값 초과면 공회전 (rpm 컬럼이 없으면 정차 = 공회전)
+    idle_rpm_min: float = 300.0
+
+    # 연속 레코드 간격이 이보다 크면 적분하지 않고 트립도 분리 (초)
+    max_gap_s: int = 300
+
+    # 이 거리(km) 미만 트립은 버림 (차고지 이동 등)
+    min_trip_km: float = 0.5
+
+    # 주유 시각과 가장 가까운 레코드 허용 간격 (초)
+    refuel_match_s: int = 600
+
+
+@dataclass
+class TraceResult:
+    daily: pd.DataFrame
+    trips: pd.DataFrame
+    refuel_positions: pd.DataFrame
+
+
+def _read_chunks(paths: Iterable[Union[str, Path]], chunk_rows: int):
+    wanted = set(TRACE_COLUMNS)
+    for path in paths:
+        reader = pd.read_csv(path,
+                             usecols=lambda c: c.strip() in wanted,
+                             chunksize=chunk_rows,
+                             encoding="utf-8-sig")
+        for chunk in reader:
+            chunk.columns = chunk.columns.str.strip()
+            yield chunk
+
+
+def _prepare(chunk: pd.DataFrame) -> pd.DataFrame:
+    out = pd.DataFrame({
+        "vehicle_id": chunk["vehicle_id"].astype(str),
+        "ts": pd.to_datetime(chunk["timestamp"], errors="coerce"),
+        "speed_kmh": pd.to_numeric(chunk["speed_kmh"], errors="coerce").fillna(0).astype(np.float32),
+        "lat": pd.to_numeric(chunk["lat"], errors="coerce").astype(np.float32),
+        "lon": pd.to_numeric(chunk["lon"], errors="coerce").astype(np.float32),
+    })
+    if "rpm" in chunk.columns:
+        out["rpm"] = pd.to_numeric(chunk["rpm"], errors="coerce").fillna(0).astype(np.float32)
+    else:
+        out["rpm"] = np.float32(np.nan)
+    return out[out["ts"].notna()].reset_index(drop=True)
+
+
+class _TraceAggregator:
+    """
+    chunk 단위로 일별/트립/주유위치 부분집계를 쌓는 streaming 집계기.
+    chunk 경계를 넘는 구간은 직전 chunk 마지막 레코드(carry)를 앞에 붙여서 이어서 적분.
+    """
+
+    def __init__(self, params: TraceParams, fuel: Optional[pd.DataFrame], fuel_time_col: str):
+        self.params = params
+        self.carry: Optional[pd.DataFrame] = None
+        self.next_trip = 0
+
+        self.daily_parts = []
+        self.trip_parts = []
+        self.refuel_parts = []
+
+        self.fuel = None
+        if fuel is not None and len(fuel):
+            f = fuel[["transaction_id", "vehicle_id", fuel_time_col]].copy()
+            f["vehicle_id"] = f["vehicle_id"].astype(str)
+            f["ts"] = pd.to_datetime(f.pop(fuel_time_col), errors="coerce").astype("datetime64[ns]")
+            f = f[f["ts"].notna()]
+            self.fuel = f.sort_values("ts").reset_index(drop=True)
+
+    def feed(self, chunk: pd.DataFrame):
+        recs = _prepare(chunk)
+        if recs.empty:
+            return
+
+        has_carry = self.carry is not None
+        if has_carry:
+            recs = pd.concat([self.carry, recs], ignore_index=True)
+
+        p = self.params
+        codes, uniq_vid = pd.factorize(recs["vehicle_id"])
+        ts = recs["ts"].to_numpy().astype("datetime64[s]").astype(np.int64)
+        speed = recs["speed_kmh"].to_numpy()
+        rpm = recs["rpm"].to_numpy()
+
+        moving = speed >= p.moving_speed_kmh
+        engine_on = np.isnan(rpm) | (rpm > p.idle_rpm_min)
+        active = moving | engine_on
+
+        # interval i -> i+1 (시작 레코드 기준으로 귀속)
+        dt = np.diff(ts)
+        link = (codes[1:] == codes[:-1]) & (dt > 0) & (dt <= p.max_gap_s)
+        dt_s = np.where(link, dt, 0).astype(np.float64)
+        dist_km = (speed[:-1].astype(np.float64) + speed[1:]) * 0.5 * dt_s / 3600.0
+        drive_s = np.where(moving[:-1], dt_s, 0.0)
+        idle_s = np.where(~moving[:-1] & engine_on[:-1], dt_s, 0.0)
+
+        self._accumulate_daily(codes[:-1], ts[:-1], uniq_vid, dist_km, drive_s, idle_s)
+        self._accumulate_trips(recs, codes, ts, active, link, dist_km, dt_s, has_carry)
+
+        if self.fuel is not None:
+            new = recs.iloc[1:] if has_carry else recs
+            self._match_refuels(new)
+
+        self.carry = recs.iloc[[-1]].reset_index(drop=True)
+
+    def _accumulate_daily(self, codes, ts, uniq_vid, dist_km, drive_s, idle_s):
+        if len(codes) == 0:
+            return
+        day = ts // 86400
+        day0 = day.min()
+        n_days = int(day.max() - day0) + 1
+        key = codes.astype(np.int64) * n_days + (day - day0)
+        keys, inv = np.unique(key, return_inverse=True)
+
+        part = pd.DataFrame({
+            "vehicle_id": uniq_vid[keys // n_days],
+            "date": ((keys % n_days) + day0).astype("datetime64[D]"),
+            "total_distance_km": np.bincount(inv, weights=dist_km),
+            "drive_s": np.bincount(inv, weights=drive_s),
+            "idle_s": np.bincount(inv, weights=idle_s),
+        })
+        self.daily_parts.append(part)
+
+    def _accumulate_trips(self, recs, codes, ts, active, link, dist_km, dt_s, has_carry):
+        # 이전 레코드와 끊기면 새 트립 시작. carry 레코드는 이전 chunk의 트립 번호를 유지
+        prev_link = np.zeros(len(ts), dtype=bool)
+        prev_link[1:] = link & active[:-1]
+        brk = active & ~prev_link
+        if has_carry:
+            brk[0] = False
+
+        trip_no = (self.next_trip - 1) + np.cumsum(brk)
+        self.next_trip += int(brk.sum())
+
+        if not active.any():
+            return
+
+        in_trip = active[:-1] & active[1:] & link
+        rec_idx = np.flatnonzero(active)
+        rec_trip = trip_no[rec_idx]
+
+        trips, first = np.unique(rec_trip, return_index=True)
+        last = np.r_[first[1:], len(rec_trip)] - 1
+        i0, i1 = rec_idx[first], rec_idx[last]
+
+        iv_trip = trip_no[:-1][in_trip]
+        pos = np.searchsorted(trips, iv_trip)
+        dist = np.bincount(pos, weights=dist_km[in_trip], minlength=len(trips))
+        dur = np.bincount(pos, weights=dt_s[in_trip], minlength=len(trips))
+
+        lat = recs["lat"].to_numpy()
+        lon = recs["lon"].to_numpy()
+        part = pd.DataFrame({
+            "vehicle_id": recs["vehicle_id"].to_numpy()[i0],
+            "trip_no": trips,
+            "start_ts": ts[i0],
+            "end_ts": ts[i1],
+            "distance_km": dist,
+            "duration_s": dur,
+            "start_lat": lat[i0], "start_lon": lon[i0],
+            "end_lat": lat[i1], "end_lon": lon[i1],
+        })
+        self.trip_parts.append(part)
+
+    def _match_refuels(self, recs: pd.DataFrame):
+        cand = recs[recs["vehicle_id"].isin(self.fuel["vehicle_id"])]
+        if cand.empty:
+            return
+        cand = cand[["vehicle_id", "ts", "lat", "lon", "speed_kmh"]].sort_values("ts")
+        cand["ts"] = cand["ts"].astype("datetime64[ns]")
+        cand["trace_ts"] = cand["ts"]
+
+        m = pd.merge_asof(self.fuel, cand, on="ts", by="vehicle_id",
+                          direction="nearest",
+                          tolerance=pd.Timedelta(seconds=self.params.refuel_match_s))
+        m = m[m["trace_ts"].notna()]
+        if m.empty:
+            return
+        m["refuel_gap_s"] = (m["trace_ts"] - m["ts"]).dt.total_seconds().abs()
+        self.refuel_parts.append(
+            m.rename(columns={"lat": "refuel_lat", "lon": "refuel_lon",
+                              "speed_kmh": "refuel_speed_kmh"})[REFUEL_POS_COLUMNS]
+        )
+
+    def result(self) -> TraceResult:
+        return TraceResult(daily=self._daily(),
+                           trips=self._trips(),
+                           refuel_positions=self._refuel_positions())
+
+    def _daily(self) -> pd.DataFrame:
+        if not self.daily_parts:
+            return pd.DataFrame(columns=DAILY_COLUMNS)
+        d = (
+            pd.concat(self.daily_parts, ignore_index=True)
+              .groupby(["vehicle_id", "date"], as_index=False)
+              .agg(total_distance_km=("total_distance_km", "sum"),
+                   drive_s=("drive_s", "sum"),
+                   idle_s=("idle_s", "sum"))
+        )
+        d["drive_time_hr"] = d["drive_s"] / 3600.0
+        d["idle_time_min"] = d["idle_s"] / 60.0
+        hr = d["drive_time_hr"].replace(0, np.nan)
+        d["avg_speed_kmh"] = (d["total_distance_km"] / hr).fillna(0)
+
+        d["total_distance_km"] = d["total_distance_km"].round(3)
+        d["drive_time_hr"] = d["drive_time_hr"].round(3)
+        d["avg_speed_kmh"] = d["avg_speed_kmh"].round(1)
+        d["idle_time_min"] = d["idle_time_min"].round(1)
+        return d[DAILY_COLUMNS]
+
+    def _trips(self) -> pd.DataFrame:
+        if not self.trip_parts:
+            return pd.DataFrame(columns=TRIP_COLUMNS)
+        # chunk 경계에 걸친 트립은 같은 trip_no로 여러 부분집계에 나뉘어 있음
+        t = (
+            pd.concat(self.trip_parts, ignore_index=True)
+              .sort_values(["trip_no", "start_ts"], kind="stable")
+              .groupby("trip_no", as_index=False)
+              .agg(vehicle_id=("vehicle_id", "first"),
+                   start_ts=("start_ts", "min"),
+                   end_ts=("end_ts", "max"),
+                   distance_km=("distance_km", "sum"),
+                   duration_s=("duration_s", "sum"),
+                   start_lat=("start_lat", "first"),
+                   start_lon=("start_lon", "first"),
+                   end_lat=("end_lat", "last"),
+                   end_lon=("end_lon", "last"))
+        )
+        t = t[t["distance_km"] >= self.params.min_trip_km].reset_index(drop=True)
+        t["start_dt"] = pd.to_datetime(t["start_ts"], unit="s")
+        t["end_dt"] = pd.to_datetime(t["end_ts"], unit="s")
+        t["duration_min"] = (t["duration_s"] / 60.0).round(1)
+        t["distance_km"] = t["distance_km"].round(3)
+        return t[TRIP_COLUMNS]
+
+    def _refuel_positions(self) -> pd.DataFrame:
+        if not self.refuel_parts:
+            return pd.DataFrame(columns=REFUEL_POS_COLUMNS)
+        # 여러 chunk에서 매칭되면 가장 가까운 레코드 채택
+        return (
+            pd.concat(self.refuel_parts, ignore_index=True)
+              .sort_values("refuel_gap_s", kind="stable")
+              .drop_duplicates("transaction_id")
+              .reset_index(drop=True)
+        )
+
+
+def ingest_dtg_traces(paths: Iterable[Union[str, Path]],
+                      fuel: Optional[pd.DataFrame] = None,
+                      params: Optional[TraceParams] = None,
+                      fuel_time_col: str = "transaction_dt") -> TraceResult:
+    """
+    초 단위 DTG trace 파일을 chunk 단위로 읽어서
+    - daily: 차량-일별 거리/주행시간/공회전시간 (dtg_daily_expanded.csv 스키마)
+    - trips: 트립 구간 (시작/종료 시각, 거리, 시작/종료 위치)
+    - refuel_positions: 주유 시각의 차량 위치 (fuel에 날짜+시각 컬럼 fuel_time_col 필요)
+    를 계산. 파일 안의 레코드는 vehicle_id, timestamp 순으로 정렬되어 있어야 함.
+    """
+    if params is None:
+        params = TraceParams()
+
+    agg = _TraceAggregator(params, fuel, fuel_time_col)
+    for chunk in _read_chunks(paths, params.chunk_rows):
+        agg.feed(chunk)
+    return agg.result()
@@ -1,23 +1,26 @@
+import warnings
 import numpy as np
 import pandas as pd
 from pathlib import Path
+from typing import Iterable, Optional
 
-def load_and_build_summary(base_dir: Path):
-    dtg  = pd.read_csv(base_dir / "dtg_daily_expanded.csv")
+from dtg_trace import TraceParams, ingest_dtg_traces
+
+def load_and_build_summary(base_dir: Path,
+                           trace_files: Optional[Iterable[Path]] = None,
+                           trace_params: Optional[TraceParams] = None):
     fuel = pd.read_csv(base_dir / "fuel_transaction_expanded.csv", encoding="cp949")
     veh  = pd.read_csv(base_dir / "vehicle_profile_expanded.csv")
 
-    for df in (dtg, fuel, veh):
+    for df in (fuel, veh):
         df.columns = df.columns.str.strip().str.replace("\ufeff", "", regex=False)
 
-    # DTG aggregate
-    dtg["date"] = pd.to_datetime(dtg["date"], errors="coerce").dt.date
-    dtg_agg = (
-        dtg.groupby("vehicle_id", as_index=False)
-           .agg(total_distance_km=("total_distance_km", "sum"),
-                total_drive_time_hr=("drive_time_hr", "sum"),
-                total_idle_time_min=("idle_time_min", "sum"))
-    )
+    # refuel timestamp for trace matching: `time` is time-of-day only, date is in `transaction_date`
+    if "transaction_date" in fuel.columns:
+        fuel["refuel_dt"] = pd.to_datetime(fuel["transaction_date"].astype(str) + " " + fuel["time"].astype(str),
+                                           errors="coerce")
+    else:
+        fuel["refuel_dt"] = pd.to_datetime(fuel["time"], errors="coerce")
 
     # Fuel preprocess
     fuel["transaction_dt"]   = pd.to_datetime(fuel["time"], errors="coerce")
@@ -27,6 +30,28 @@ def load_and_build_summary(base_dir: Path):
     fuel["fuel_liter"] = pd.to_numeric(fuel["fuel_liter"], errors="coerce").fillna(0)
     fuel["is_night"] = ((fuel["transaction_hour"] >= 23) | (fuel["transaction_hour"] < 6)).astype(np.int8)
 
+    # DTG daily rows: raw per-second traces if given, else pre-rolled daily csv
+    if trace_files is not None:
+        traces = ingest_dtg_traces(trace_files, fuel=fuel, params=trace_params,
+                                   fuel_time_col="refuel_dt")
+        dtg = traces.daily.copy()
+        if len(fuel) and traces.refuel_positions.empty:
+            warnings.warn("DTG traces given but no fuel transaction matched a trace record; "
+                          "check refuel_dt vs trace timestamps", RuntimeWarning)
+        fuel = fuel.merge(traces.refuel_positions, on="transaction_id", how="left")
+    else:
+        dtg = pd.read_csv(base_dir / "dtg_daily_expanded.csv")
+        dtg.columns = dtg.columns.str.strip().str.replace("\ufeff", "", regex=False)
+
+    # DTG aggregate
+    dtg["date"] = pd.to_datetime(dtg["date"], errors="coerce").dt.date
+    dtg_agg = (
+        dtg.groupby("vehicle_id", as_index=False)
+           .agg(total_distance_km=("total_distance_km", "sum"),
+                total_drive_time_hr=("drive_time_hr", "sum"),
+                total_idle_time_min=("idle_time_min", "sum"))
+    )
+
     fuel_agg = (
         fuel.groupby("vehicle_id", as_index=False)
             .agg(actual_fuel_l=("fuel_liter", "sum"),
@@ -4,10 +4,14 @@ from datetime import datetime
 
 from pipeline import load_and_build_summary
 from rules_baseline import apply_baseline_rules
+from anomaly_score import apply_anomaly_scores
 from refund_engine import RefundParams, run_refund_engine
 
 BASE_DIR = Path(r"C:\Users\2512-02\Desktop\유가보조금\R\mock_dataset")
 
+# 초 단위 DTG trace가 있으면 일별 csv 대신 사용
+TRACE_DIR = BASE_DIR / "dtg_trace"
+
 def safe_to_csv(df: pd.DataFrame, path: Path):
     path.parent.mkdir(parents=True, exist_ok=True)
     try:
@@ -20,8 +24,10 @@ def safe_to_csv(df: pd.DataFrame, path: Path):
         print(f"[WARN] Permission denied. Saved to: {alt}")
 
 def main():
-    summary, fuel, veh = load_and_build_summary(BASE_DIR)
+    trace_files = sorted(TRACE_DIR.glob("*.csv")) or None
+    summary, fuel, veh = load_and_build_summary(BASE_DIR, trace_files=trace_files)
     summary = apply_baseline_rules(summary, fuel, veh)
+    summary = apply_anomaly_scores(summary)
 
     output_cols = [
         "vehicle_id", "vehicle_no", "ton_class", "fuel_type",
@@ -30,7 +36,7 @@ def main():
         "ind_over_tank", "ind_over_tank_cnt", "ind_max_daily_refuel",
         "ind_fuel_ratio", "ind_station_max_share",
         "score_over_tank", "score_daily_refuel", "score_fuel_over", "score_fuel_under", "score_station",
-        "risk_score", "risk_tier", "risk_reason"
+        "risk_score", "anomaly_score", "risk_tier", "risk_reason"
     ]
     output_cols = [c for c in output_cols if c in summary.columns]
 